@@ -12,31 +12,98 @@ load_dotenv(".env")
 # 1) Make sure it is at the beginning of the script so that it will load dotenv before initializing BaseSettings.
 # 2) The ".env" argument is necessary to make sure it loads `.env` from the current directory.
 
-import subprocess
+import subprocess as sp
 from importlib.resources import path as rpath
 
 import fire
-from alphaagent.app.qlib_rd_loop.factor_mining import main as mine
-from alphaagent.app.qlib_rd_loop.factor_backtest import main as backtest
-from alphaagent.app.utils.health_check import health_check
-from alphaagent.app.utils.info import collect_info
 from alphaagent.app.utils.clear import clear
-from alphaagent.app.utils.data import init, data_refresh
 
+# Heavy subcommands (qlib, pandas, docker, ...) are imported only when invoked,
+# so light commands such as `clear` start instantly.
 
-def ui(port=19899, log_dir="./log", debug=False):
+
+def init(force=False):
+    """
+    Extract bundled Qlib data ZIP to the data directory.
+    """
+    from alphaagent.app.utils.data import init as _init
+
+    return _init(force=force)
+
+
+def data_refresh():
+    """
+    Download latest S&P 500 data, rebuild Qlib binary format, and update the ZIP.
+    """
+    from alphaagent.app.utils.data import data_refresh as _data_refresh
+
+    return _data_refresh()
+
+
+def mine(path=None, step_n=None, potential_direction=None, stop_event=None):
+    """
+    Autonomous alpha factor mining.
+    """
+    from alphaagent.app.qlib_rd_loop.factor_mining import main
+
+    return main(path=path, step_n=step_n, potential_direction=potential_direction, stop_event=stop_event)
+
+
+def backtest(path=None, step_n=None, factor_path=None):
+    """
+    Auto R&D Evolving loop for fintech factors.
+    """
+    from alphaagent.app.qlib_rd_loop.factor_backtest import main
+
+    return main(path=path, step_n=step_n, factor_path=factor_path)
+
+
+def health_check():
+    """
+    Check that docker is installed correctly,
+    and that the ports used in the sample README are not occupied.
+    """
+    from alphaagent.app.utils.health_check import health_check as _health_check
+
+    return _health_check()
+
+
+def collect_info():
+    """
+    Prints information about the system and the installed packages.
+    """
+    from alphaagent.app.utils.info import collect_info as _collect_info
+
+    return _collect_info()
+
+
+def ui(port=19899, log_dir="./log", debug=False, subprocess=False):
     """
     start web app to show the log traces.
+
+    The app runs inside the current interpreter by default; pass `--subprocess`
+    to launch it through a separate `streamlit run` process instead.
     """
     with rpath("alphaagent.log.ui", "app.py") as app_path:
-        cmds = ["streamlit", "run", app_path, f"--server.port={port}"]
-        if log_dir or debug:
-            cmds.append("--")
+        args = []
         if log_dir:
-            cmds.append(f"--log_dir={log_dir}")
+            args.append(f"--log_dir={log_dir}")
         if debug:
-            cmds.append("--debug")
-        subprocess.run(cmds)
+            args.append("--debug")
+
+        if subprocess:
+            cmds = ["streamlit", "run", app_path, f"--server.port={port}"]
+            if args:
+                cmds.append("--")
+                cmds.extend(args)
+            sp.run(cmds)
+            return
+
+        from streamlit.web import bootstrap
+
+        flag_options = {"server_port": port}
+        bootstrap.load_config_options(flag_options=flag_options)
+        bootstrap.run(str(app_path), False, args, flag_options)
 
 
 def app():
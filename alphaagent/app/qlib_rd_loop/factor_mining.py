@@ -5,6 +5,7 @@ Factor workflow with session control
 from typing import Any
 import fire
 import signal
+import inspect
 import sys
 import threading
 from functools import wraps
@@ -22,27 +23,71 @@ from alphaagent.oai.llm_conf import LLM_SETTINGS
 
 
 
+# Seconds a run gets to stop on its own at the next step boundary before it is interrupted
+_STOP_GRACE_SECONDS = 60
+
+
+def _interrupt_thread(thread: threading.Thread) -> None:
+    """Raise KeyboardInterrupt in the given thread."""
+    if thread is threading.main_thread():
+        # A real SIGINT makes blocking system calls (subprocess waits, socket reads) return with EINTR,
+        # so the KeyboardInterrupt is raised right away rather than when the call finishes
+        signal.pthread_kill(thread.ident, signal.SIGINT)
+    else:
+        # Delivered the next time the thread runs Python bytecode
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread.ident), ctypes.py_object(KeyboardInterrupt))
+
+
 def force_timeout():
     def decorator(func):
+        signature = inspect.signature(func)
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             # Prioritize timeout parameter
             seconds = LLM_SETTINGS.factor_mining_timeout
-            def handle_timeout(signum, frame):
+            stop_event = signature.bind_partial(*args, **kwargs).arguments.get("stop_event")
+            caller = threading.current_thread()
+            timed_out = threading.Event()
+            finished = threading.Event()
+            timers = []
+
+            def start_timer(delay, callback):
+                # A timer thread works from any caller thread, unlike SIGALRM
+                timer = threading.Timer(delay, callback)
+                timer.daemon = True
+                timers.append(timer)
+                timer.start()
+
+            def interrupt():
+                if not finished.is_set():
+                    _interrupt_thread(caller)
+
+            def handle_timeout():
+                if finished.is_set():
+                    return
                 logger.error(f"Forcing program termination, exceeded {seconds} seconds")
-                sys.exit(1)
+                timed_out.set()
+                # Prefer a graceful stop, but keep a hard deadline: the loop only checks the event between steps
+                if stop_event is not None:
+                    stop_event.set()
+                    start_timer(_STOP_GRACE_SECONDS, interrupt)
+                else:
+                    interrupt()
 
-            # Set signal handler
-            signal.signal(signal.SIGALRM, handle_timeout)
-            # Set alarm
-            signal.alarm(seconds)
+            start_timer(seconds, handle_timeout)
 
             try:
-                result = func(*args, **kwargs)
+                return func(*args, **kwargs)
+            except KeyboardInterrupt:
+                if timed_out.is_set():
+                    sys.exit(1)
+                raise
             finally:
-                # Cancel alarm
-                signal.alarm(0)
-            return result
+                # Cancel timers
+                finished.set()
+                for timer in timers:
+                    timer.cancel()
         return wrapper
     return decorator
 
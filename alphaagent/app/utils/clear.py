@@ -1,27 +1,27 @@
-import shutil
 from pathlib import Path
 
+from alphaagent.utils import parallel_rmtree
+
+TARGET_DIRS = ("log", "pickle_cache", "git_ignore_folder")
+TARGET_FILES = ("graph.pkl", "prompt_cache.db")
+
 
 def clear():
     """Clear all research results and knowledge base data."""
-    targets = [
-        Path.cwd() / "log",
-        Path.cwd() / "pickle_cache",
-        Path.cwd() / "git_ignore_folder",
-    ]
-    files = [
-        Path.cwd() / "graph.pkl",
-        Path.cwd() / "prompt_cache.db",
-    ]
+    cwd = Path.cwd()
 
-    for target in targets:
-        if target.exists():
-            shutil.rmtree(target)
+    for name in TARGET_DIRS:
+        target = cwd / name
+        if target.is_dir():
+            parallel_rmtree(target)
             print(f"Removed {target}")
 
-    for f in files:
-        if f.exists():
+    for name in TARGET_FILES:
+        f = cwd / name
+        try:
             f.unlink()
-            print(f"Removed {f}")
+        except FileNotFoundError:
+            continue
+        print(f"Removed {f}")
 
     print("All research results and knowledge base cleared.")
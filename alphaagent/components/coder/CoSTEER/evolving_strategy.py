@@ -15,7 +15,8 @@ from alphaagent.core.evolving_framework import EvolvingStrategy, QueriedKnowledg
 from alphaagent.core.experiment import Workspace
 from alphaagent.core.prompts import Prompts
 from alphaagent.core.scenario import Task
-from alphaagent.core.utils import multiprocessing_wrapper
+from alphaagent.core.utils import multiprocessing_wrapper, multithreading_wrapper
+from alphaagent.oai.llm_conf import LLM_SETTINGS
 
 implement_prompts = Prompts(file_path=Path(__file__).parent / "prompts.yaml")
 
@@ -33,6 +34,15 @@ class MultiProcessEvolvingStrategy(EvolvingStrategy):
     ) -> Workspace:
         raise NotImplementedError
 
+    def task_implementation_key(self, target_task: Task) -> str:
+        """
+        Sub tasks with the same key are implemented once and share the result.
+
+        The key must cover every task field `implement_one_task` reads; override it when that goes
+        beyond the task information.
+        """
+        return target_task.get_task_information()
+
     def select_one_round_tasks(
         self,
         to_be_finished_task_index: list,
@@ -84,16 +94,32 @@ class MultiProcessEvolvingStrategy(EvolvingStrategy):
                 to_be_finished_task_index, evo, self.settings.select_threshold, queried_knowledge, self.scen
             )
 
-        result = multiprocessing_wrapper(
-            [
-                (self.implement_one_task, (evo.sub_tasks[target_index], queried_knowledge))
-                for target_index in to_be_finished_task_index
-            ],
-            n=RD_AGENT_SETTINGS.multi_proc_n,
+        # sub tasks with the same implementation key get the same prompts, so implement each of them only once
+        task_key_to_index = {}
+        for target_index in to_be_finished_task_index:
+            task_key_to_index.setdefault(self.task_implementation_key(evo.sub_tasks[target_index]), target_index)
+
+        func_calls = [
+            (self.implement_one_task, (evo.sub_tasks[target_index], queried_knowledge))
+            for target_index in task_key_to_index.values()
+        ]
+        # any enabled LLM cache opens the sqlite cache, whose single connection cannot be shared across
+        # threads, so keep the process pool then
+        uses_sqlite_cache = (
+            self.settings.coder_use_cache
+            or LLM_SETTINGS.use_chat_cache
+            or LLM_SETTINGS.dump_chat_cache
+            or LLM_SETTINGS.use_embedding_cache
+            or LLM_SETTINGS.dump_embedding_cache
         )
+        if RD_AGENT_SETTINGS.multi_thread_n > 0 and not uses_sqlite_cache:
+            result = multithreading_wrapper(func_calls, n=RD_AGENT_SETTINGS.multi_thread_n)
+        else:
+            result = multiprocessing_wrapper(func_calls, n=RD_AGENT_SETTINGS.multi_proc_n)
+        task_key_to_result = dict(zip(task_key_to_index, result))
         code_list = [None for _ in range(len(evo.sub_tasks))]
-        for index, target_index in enumerate(to_be_finished_task_index):
-            code_list[target_index] = result[index]
+        for target_index in to_be_finished_task_index:
+            code_list[target_index] = task_key_to_result[self.task_implementation_key(evo.sub_tasks[target_index])]
 
         evo = self.assign_code_list_to_evo(code_list, evo)
         evo.corresponding_selection = to_be_finished_task_index
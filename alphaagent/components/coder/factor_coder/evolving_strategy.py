@@ -1,9 +1,15 @@
 from __future__ import annotations
 
-import json
+import functools
+import os
 from pathlib import Path
 import re
-from jinja2 import Environment, StrictUndefined
+from jinja2 import Environment, StrictUndefined, Template
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
 
 from alphaagent.components.coder.CoSTEER.evolving_strategy import (
     MultiProcessEvolvingStrategy,
@@ -18,18 +24,69 @@ from alphaagent.core.prompts import Prompts
 from alphaagent.core.template import CodeTemplate
 from alphaagent.oai.llm_conf import LLM_SETTINGS
 from alphaagent.oai.llm_utils import APIBackend
-from alphaagent.core.utils import multiprocessing_wrapper
-from alphaagent.core.conf import RD_AGENT_SETTINGS
 
 code_template = CodeTemplate(template_path=Path(__file__).parent / "template.jinjia2")
 implement_prompts = Prompts(file_path=Path(__file__).parent / "prompts.yaml")
 
+# 匹配 expr = "xxx" 或 expr = 'xxx'
+_EXPR_RE = re.compile(r'expr\s*=\s*["\']([^"\']*)["\']')
+_JSON_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.S)
+
+# json_mode replies are already validated (and retried on JSONDecodeError) inside APIBackend, with
+# response_format=json_object for chat models, so these loops only guard against a missing field.
+_JSON_REPLY_ATTEMPTS = 2
+
+# One shared environment so prompt templates are compiled once per process instead of per render.
+# trim_blocks/lstrip_blocks stay off: they would change the whitespace of every prompt around block tags,
+# and the trailing `.strip("\n")` calls are free (str.strip returns the same object) when there is nothing to strip.
+_JENV = Environment(undefined=StrictUndefined, cache_size=-1, auto_reload=False)
+
+
+@functools.lru_cache(maxsize=None)
+def _tmpl(source: str) -> Template:
+    """Return the compiled template for a prompt string, compiling it on first use."""
+    return _JENV.from_string(source)
+
+
+@functools.lru_cache(maxsize=None)
+def _backend_for_process(pid: int, use_chat_cache: bool | None) -> APIBackend:
+    return APIBackend(use_chat_cache=use_chat_cache)
+
+
+def _backend(use_chat_cache: bool | None = None) -> APIBackend:
+    """Return this process's shared APIBackend; forked workers lazily build their own."""
+    return _backend_for_process(os.getpid(), use_chat_cache)
+
+
+def _parse_json_field(text: str, field: str) -> str | None:
+    """Return the string `field` of an LLM JSON reply, unwrapping a markdown fence if needed; None if unusable."""
+    try:
+        data = _json_loads(text)
+    except ValueError:
+        match = _JSON_FENCE_RE.search(text)
+        if match is None:
+            return None
+        try:
+            data = _json_loads(match.group(1))
+        except ValueError:
+            return None
+    value = data.get(field) if isinstance(data, dict) else None
+    return value if isinstance(value, str) else None
+
+
 class FactorMultiProcessEvolvingStrategy(MultiProcessEvolvingStrategy):
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.num_loop = 0
         self.haveSelected = False
+        self._scenario_desc_cache: dict[tuple[str, str | None], str] = {}
 
+    def scenario_desc(self, target_task: FactorTask, filtered_tag: str | None = None) -> str:
+        # 场景描述按任务缓存，error_summary 与各子类的实现提示共用，避免重复拼接
+        key = (target_task.get_task_information(), filtered_tag)
+        if key not in self._scenario_desc_cache:
+            self._scenario_desc_cache[key] = self.scen.get_scenario_all_desc(target_task, filtered_tag=filtered_tag)
+        return self._scenario_desc_cache[key]
 
     def error_summary(
         self,
@@ -38,10 +95,9 @@ class FactorMultiProcessEvolvingStrategy(MultiProcessEvolvingStrategy):
         queried_similar_error_knowledge_to_render: list,
     ) -> str:
         error_summary_system_prompt = (
-            Environment(undefined=StrictUndefined)
-            .from_string(implement_prompts["evolving_strategy_error_summary_v2_system"])
+            _tmpl(implement_prompts["evolving_strategy_error_summary_v2_system"])
             .render(
-                scenario=self.scen.get_scenario_all_desc(target_task),
+                scenario=self.scenario_desc(target_task),
                 factor_information_str=target_task.get_task_information(),
                 code_and_feedback=queried_former_failed_knowledge_to_render[-1].get_implementation_and_feedback_str(),
             )
@@ -49,15 +105,14 @@ class FactorMultiProcessEvolvingStrategy(MultiProcessEvolvingStrategy):
         )
         for _ in range(10):  # max attempt to reduce the length of error_summary_user_prompt
             error_summary_user_prompt = (
-                Environment(undefined=StrictUndefined)
-                .from_string(implement_prompts["evolving_strategy_error_summary_v2_user"])
+                _tmpl(implement_prompts["evolving_strategy_error_summary_v2_user"])
                 .render(
                     queried_similar_error_knowledge=queried_similar_error_knowledge_to_render,
                 )
                 .strip("\n")
             )
             if (
-                APIBackend().build_messages_and_calculate_token(
+                _backend().build_messages_and_calculate_token(
                     user_prompt=error_summary_user_prompt, system_prompt=error_summary_system_prompt
                 )
                 < LLM_SETTINGS.chat_token_limit
@@ -65,8 +120,8 @@ class FactorMultiProcessEvolvingStrategy(MultiProcessEvolvingStrategy):
                 break
             elif len(queried_similar_error_knowledge_to_render) > 0:
                 queried_similar_error_knowledge_to_render = queried_similar_error_knowledge_to_render[:-1]
-        error_summary_critics = APIBackend(
-            use_chat_cache=FACTOR_COSTEER_SETTINGS.coder_use_cache
+        error_summary_critics = _backend(
+            FACTOR_COSTEER_SETTINGS.coder_use_cache
         ).build_messages_and_create_chat_completion(
             user_prompt=error_summary_user_prompt, system_prompt=error_summary_system_prompt, json_mode=False
         )
@@ -107,18 +162,17 @@ class FactorMultiProcessEvolvingStrategy(MultiProcessEvolvingStrategy):
         ][1]
 
         system_prompt = (
-            Environment(undefined=StrictUndefined)
-            .from_string(
-                implement_prompts["evolving_strategy_factor_implementation_v1_system"],
-            )
+            _tmpl(implement_prompts["evolving_strategy_factor_implementation_v1_system"])
             .render(
-                scenario=self.scen.get_scenario_all_desc(target_task, filtered_tag="feature"),
+                scenario=self.scenario_desc(target_task, filtered_tag="feature"),
                 queried_former_failed_knowledge=queried_former_failed_knowledge_to_render,
             )
         )
         queried_similar_successful_knowledge_to_render = queried_similar_successful_knowledge
         queried_similar_error_knowledge_to_render = queried_similar_error_knowledge
-        # 动态地防止prompt超长
+        error_summaries: dict[tuple[int, int], str] = {}
+        # 动态地防止prompt超长。按渲染后的整段提示计数（模板文本和消息开销都算在内）；
+        # 每次渲染都可能触发一次 error_summary 的 LLM 调用，所以保持逐条裁剪而不是二分查找
         for _ in range(10):  # max attempt to reduce the length of user_prompt
             # 总结error（可选）
             if (
@@ -127,25 +181,21 @@ class FactorMultiProcessEvolvingStrategy(MultiProcessEvolvingStrategy):
                 and len(queried_similar_error_knowledge_to_render) != 0
                 and len(queried_former_failed_knowledge_to_render) != 0
             ):
-                error_summary_critics = self.error_summary(
-                    target_task,
-                    queried_former_failed_knowledge_to_render,
-                    queried_similar_error_knowledge_to_render,
-                )
+                # 错误摘要只取决于失败记录和相似错误，裁剪相似成功案例时复用上一次的结果
+                summary_key = (len(queried_former_failed_knowledge_to_render), len(queried_similar_error_knowledge_to_render))
+                if summary_key not in error_summaries:
+                    error_summaries[summary_key] = self.error_summary(
+                        target_task,
+                        queried_former_failed_knowledge_to_render,
+                        queried_similar_error_knowledge_to_render,
+                    )
+                error_summary_critics = error_summaries[summary_key]
             else:
                 error_summary_critics = None
             # 构建user_prompt。开始写代码
             user_prompt = (
-                Environment(undefined=StrictUndefined)
-                .from_string(
-                    implement_prompts["evolving_strategy_factor_implementation_v2_user"],
-                )
+                _tmpl(implement_prompts["evolving_strategy_factor_implementation_v2_user"])
                 .render(
-                    # factor_information_str=target_factor_task_information,
-                    # queried_similar_successful_knowledge=queried_similar_successful_knowledge_to_render,
-                    # queried_similar_error_knowledge=queried_similar_error_knowledge_to_render,
-                    # error_summary_critics=error_summary_critics,
-                    # latest_attempt_to_latest_successful_execution=latest_attempt_to_latest_successful_execution,
                     factor_information_str=target_task.get_task_description(),
                     queried_similar_error_knowledge=queried_similar_error_knowledge_to_render,
                     error_summary_critics=error_summary_critics,
@@ -162,7 +212,7 @@ class FactorMultiProcessEvolvingStrategy(MultiProcessEvolvingStrategy):
                 .strip("\n")
             )
             if (
-                APIBackend().build_messages_and_calculate_token(user_prompt=user_prompt, system_prompt=system_prompt)
+                _backend().build_messages_and_calculate_token(user_prompt=user_prompt, system_prompt=system_prompt)
                 < LLM_SETTINGS.chat_token_limit
             ):
                 break
@@ -174,20 +224,16 @@ class FactorMultiProcessEvolvingStrategy(MultiProcessEvolvingStrategy):
                 queried_similar_successful_knowledge_to_render = queried_similar_successful_knowledge_to_render[:-1]
             elif len(queried_similar_error_knowledge_to_render) > 0:
                 queried_similar_error_knowledge_to_render = queried_similar_error_knowledge_to_render[:-1]
-        for _ in range(10):
-            try:
-                code = json.loads(
-                    APIBackend(
-                        use_chat_cache=FACTOR_COSTEER_SETTINGS.coder_use_cache
-                    ).build_messages_and_create_chat_completion(
-                        user_prompt=user_prompt, system_prompt=system_prompt, json_mode=True
-                    )
-                )["code"]
+        for _ in range(_JSON_REPLY_ATTEMPTS):
+            code = _parse_json_field(
+                _backend(FACTOR_COSTEER_SETTINGS.coder_use_cache).build_messages_and_create_chat_completion(
+                    user_prompt=user_prompt, system_prompt=system_prompt, json_mode=True
+                ),
+                "code",
+            )
+            if code is not None:
                 return code
-            except json.decoder.JSONDecodeError:
-                pass
-        else:
-            return ""  # return empty code if failed to get code after 10 attempts
+        return ""  # return empty code if failed to get code after all attempts
 
     def assign_code_list_to_evo(self, code_list, evo):
         for index in range(len(evo.sub_tasks)):
@@ -201,22 +247,15 @@ class FactorMultiProcessEvolvingStrategy(MultiProcessEvolvingStrategy):
 
 
 alphaagent_implement_prompts = Prompts(file_path=Path(__file__).parent / "prompts_alphaagent.yaml")
-class FactorParsingStrategy(MultiProcessEvolvingStrategy):
-    def __init__(self, *args, **kwargs) -> None:
-        super().__init__(*args, **kwargs)
-        self.num_loop = 0
-        self.haveSelected = False
-
+class FactorParsingStrategy(FactorMultiProcessEvolvingStrategy):
     def extract_expr(self, code_str: str) -> str:
         """从代码字符串中提取expr表达式"""
-        # 使用正则表达式匹配expr = "xxx"或expr = 'xxx'的模式
-        pattern = r'expr\s*=\s*["\']([^"\']*)["\']'
-        match = re.search(pattern, code_str)
-        if match:
-            return match.group(1)
-        else:
-            return ""
+        match = _EXPR_RE.search(code_str)
+        return match.group(1) if match else ""
 
+    def task_implementation_key(self, target_task: FactorTask) -> str:
+        # 首次执行直接渲染 factor_expression，而任务信息中不包含表达式
+        return f"{target_task.get_task_information()}\nfactor_expression: {target_task.factor_expression}"
 
     def implement_one_task(
         self,
@@ -283,20 +322,29 @@ class FactorParsingStrategy(MultiProcessEvolvingStrategy):
 
             # 构建系统提示
             system_prompt = (
-                Environment(undefined=StrictUndefined)
-                .from_string(
-                    alphaagent_implement_prompts["evolving_strategy_factor_implementation_v1_system"],
-                )
+                _tmpl(alphaagent_implement_prompts["evolving_strategy_factor_implementation_v1_system"])
                 .render(
-                    scenario=self.scen.get_scenario_all_desc(target_task, filtered_tag="feature"),
+                    scenario=self.scenario_desc(target_task, filtered_tag="feature"),
                     # former_expression=self.extract_expr(queried_former_failed_knowledge_to_render[-1].implementation.code),
                     # former_feedback=queried_former_failed_knowledge_to_render[-1].feedback,
                 )
             )
+            # 目标因子信息与最近一次失败反馈不随裁剪变化，只渲染一次
+            user_prompt_header = (
+                _tmpl(alphaagent_implement_prompts["evolving_strategy_factor_implementation_v2_user_header"])
+                .render(
+                    factor_information_str=target_task.get_task_description(),
+                    former_expression=self.extract_expr(queried_former_failed_knowledge_to_render[-1].implementation.code),
+                    former_feedback=queried_former_failed_knowledge_to_render[-1].feedback,
+                )
+            )
+
             queried_similar_successful_knowledge_to_render = queried_similar_successful_knowledge
             queried_similar_error_knowledge_to_render = queried_similar_error_knowledge
-            
-            # 动态调整提示长度，防止超出token限制
+            error_summaries: dict[tuple[int, int], str] = {}
+
+            # 动态调整提示长度，防止超出token限制。按渲染后的整段提示计数；
+            # 每次渲染都可能触发一次 error_summary 的 LLM 调用，所以保持逐条裁剪而不是二分查找
             for _ in range(10):  # 最多尝试10次减少用户提示长度
                 # 生成错误摘要（可选功能）
                 if (
@@ -305,25 +353,23 @@ class FactorParsingStrategy(MultiProcessEvolvingStrategy):
                     and len(queried_similar_error_knowledge_to_render) != 0
                     and len(queried_former_failed_knowledge_to_render) != 0
                 ):
-                    error_summary_critics = self.error_summary(
-                        target_task,
-                        queried_former_failed_knowledge_to_render,
-                        queried_similar_error_knowledge_to_render,
-                    )
+                    # 错误摘要只取决于失败记录和相似错误，裁剪相似成功案例时复用上一次的结果
+                    summary_key = (len(queried_former_failed_knowledge_to_render), len(queried_similar_error_knowledge_to_render))
+                    if summary_key not in error_summaries:
+                        error_summaries[summary_key] = self.error_summary(
+                            target_task,
+                            queried_former_failed_knowledge_to_render,
+                            queried_similar_error_knowledge_to_render,
+                        )
+                    error_summary_critics = error_summaries[summary_key]
                 else:
                     error_summary_critics = None
-                    
-                # 构建用户提示
-                user_prompt = (
-                    Environment(undefined=StrictUndefined)
-                    .from_string(
-                        alphaagent_implement_prompts["evolving_strategy_factor_implementation_v2_user"],
-                    )
+
+                # 构建用户提示：仅渲染随裁剪变化的知识部分
+                user_prompt_knowledge = (
+                    _tmpl(alphaagent_implement_prompts["evolving_strategy_factor_implementation_v2_user_knowledge"])
                     .render(
-                        factor_information_str=target_task.get_task_description(),
                         queried_similar_error_knowledge=queried_similar_error_knowledge_to_render,
-                        former_expression=self.extract_expr(queried_former_failed_knowledge_to_render[-1].implementation.code),
-                        former_feedback=queried_former_failed_knowledge_to_render[-1].feedback,
                         error_summary_critics=error_summary_critics,
                         similar_successful_factor_description=(
                             queried_similar_successful_knowledge_to_render[-1].target_task.get_task_description()
@@ -335,12 +381,12 @@ class FactorParsingStrategy(MultiProcessEvolvingStrategy):
                         ),
                         latest_attempt_to_latest_successful_execution=latest_attempt_to_latest_successful_execution,
                     )
-                    .strip("\n")
                 )
+                user_prompt = f"{user_prompt_header}\n\n{user_prompt_knowledge}".strip("\n")
 
                 # 检查token数量是否超限，若超限则逐步减少要渲染的知识
                 if (
-                    APIBackend().build_messages_and_calculate_token(user_prompt=user_prompt, system_prompt=system_prompt)
+                    _backend().build_messages_and_calculate_token(user_prompt=user_prompt, system_prompt=system_prompt)
                     < LLM_SETTINGS.chat_token_limit
                 ):
                     break
@@ -355,29 +401,28 @@ class FactorParsingStrategy(MultiProcessEvolvingStrategy):
                 elif len(queried_similar_error_knowledge_to_render) > 0:
                     # 减少错误案例
                     queried_similar_error_knowledge_to_render = queried_similar_error_knowledge_to_render[:-1]
-                    
-            # 尝试最多10次从LLM获取表达式
-            for _ in range(10):
-                try:
-                    # 调用API获取新的表达式
-                    expr = json.loads(
-                        APIBackend(
-                            use_chat_cache=FACTOR_COSTEER_SETTINGS.coder_use_cache
-                        ).build_messages_and_create_chat_completion(
-                            user_prompt=user_prompt, system_prompt=system_prompt, json_mode=True, reasoning_flag=False
-                        )
-                    )["expr"]
-                    
-                    # 使用新表达式渲染代码模板
-                    rendered_code = code_template.render(
-                        expression=expr, 
-                        factor_name=target_task.factor_name 
-                    )
-                    return rendered_code
-                    
-                except json.decoder.JSONDecodeError:
-                    # JSON解析失败时继续尝试
-                    pass
+
+            # NOTE: 不做多任务合并请求(batch prompting)：只有带失败历史的任务才会调用LLM，
+            # 且系统提示包含按任务过滤的场景描述，各任务之间没有可共享的提示前缀
+            # 尝试从LLM获取表达式
+            for _ in range(_JSON_REPLY_ATTEMPTS):
+                # 调用API获取新的表达式（返回被```json包裹时直接解包，不再重新请求）
+                expr = _parse_json_field(
+                    _backend(FACTOR_COSTEER_SETTINGS.coder_use_cache).build_messages_and_create_chat_completion(
+                        user_prompt=user_prompt, system_prompt=system_prompt, json_mode=True, reasoning_flag=False
+                    ),
+                    "expr",
+                )
+                # JSON解析失败或缺少expr字段时继续尝试
+                if expr is None:
+                    continue
+
+                # 使用新表达式渲染代码模板
+                rendered_code = code_template.render(
+                    expression=expr, 
+                    factor_name=target_task.factor_name 
+                )
+                return rendered_code
     
     def assign_code_list_to_evo(self, code_list, evo):
         for index in range(len(evo.sub_tasks)):
@@ -428,17 +473,13 @@ class FactorRunningStrategy(MultiProcessEvolvingStrategy):
         **kwargs,
     ) -> EvolvingItem:
         # 1.找出需要evolve的task
-        to_be_finished_task_index = []
-        for index, target_task in enumerate(evo.sub_tasks):
-            to_be_finished_task_index.append(index)
-
-        result = multiprocessing_wrapper(
-            [
-                (self.implement_one_task, (evo.sub_tasks[target_index], queried_knowledge))
-                for target_index in to_be_finished_task_index
-            ],
-            n=RD_AGENT_SETTINGS.multi_proc_n,
-        )
+        to_be_finished_task_index = list(range(len(evo.sub_tasks)))
+
+        # 仅渲染代码模板，直接在当前进程执行，避免进程/线程池的开销
+        result = [
+            self.implement_one_task(evo.sub_tasks[target_index], queried_knowledge)
+            for target_index in to_be_finished_task_index
+        ]
         code_list = [None for _ in range(len(evo.sub_tasks))]
         for index, target_index in enumerate(to_be_finished_task_index):
             code_list[target_index] = result[index]
@@ -24,6 +24,10 @@ coder_prompts = Prompts(file_path=Path(__file__).parent / "prompts.yaml")
 
 
 class ModelMultiProcessEvolvingStrategy(MultiProcessEvolvingStrategy):
+    def task_implementation_key(self, target_task: ModelTask) -> str:
+        # the system prompt also renders the base code, which is not part of the task information
+        return f"{target_task.get_task_information()}base_code: {target_task.base_code}"
+
     def implement_one_task(
         self,
         target_task: ModelTask,
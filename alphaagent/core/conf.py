@@ -76,6 +76,9 @@ class RDAgentSettings(ExtendedBaseSettings):
 
     # multi processing conf
     multi_proc_n: int = 1
+    # number of threads for I/O bound (LLM) task implementation; 0 keeps the process pool above
+    # NOTE: ignored while any LLM cache (including coder_use_cache) is on, the sqlite connection is bound to one thread
+    multi_thread_n: int = 0
 
     # pickle cache conf
     cache_with_pickle: bool = True  # whether to use pickle cache
@@ -6,7 +6,15 @@ from alphaagent.core.utils import SingletonBaseClass
 
 
 class Prompts(SingletonBaseClass, dict[str, str]):
+    """
+    Prompt templates of a yaml file, stored as a plain dict of strings.
+    One instance per `file_path`; the yaml is parsed only on the first construction.
+    """
+
     def __init__(self, file_path: Path) -> None:
+        # SingletonBaseClass returns the existing instance, but Python still calls __init__ on it
+        if self:
+            return
         super().__init__()
         with file_path.open(encoding="utf8") as file:
             prompt_yaml_dict = yaml.safe_load(file)
@@ -12,7 +12,12 @@ class CodeTemplate:
         :param template_path: Path to the Jinja2 template file.
         """
         self.template_path = template_path
-        self.env = Environment(loader=FileSystemLoader(template_path.parent))
+        # The template is compiled once here and reused by every render; no reload checks needed
+        self.env = Environment(
+            loader=FileSystemLoader(template_path.parent),
+            auto_reload=False,
+            cache_size=-1,
+        )
         self.template = self.env.get_template(template_path.name)
 
     def render(self, **kwargs: Any) -> str:
@@ -7,6 +7,7 @@ import multiprocessing as mp
 import pickle
 import random
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, ClassVar, NoReturn, cast
 
@@ -153,6 +154,36 @@ def multiprocessing_wrapper(func_calls: list[tuple[Callable, tuple]], n: int) ->
         return [result.get() for result in results]
 
 
+def multithreading_wrapper(func_calls: list[tuple[Callable, tuple]], n: int) -> list:
+    """It will use a thread pool to call the functions in func_calls with the given parameters.
+    The results equals to `return  [f(*args) for f, args in func_calls]`
+    It will not start any thread if `n=1`
+
+    NOTE:
+    This is meant for I/O bound calls (e.g. LLM requests). Threads share the process, so the
+    compiled templates and API clients are shared as well, but the chat_cache_seed trace is not
+    reproducible per call like in `multiprocessing_wrapper`.
+
+    Parameters
+    ----------
+    func_calls : List[Tuple[Callable, Tuple]]
+        the list of functions and their parameters
+    n : int
+        the number of threads
+
+    Returns
+    -------
+    list
+
+    """
+    if n == 1 or max(1, min(n, len(func_calls))) == 1:
+        return [f(*args) for f, args in func_calls]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(n, len(func_calls)))) as executor:
+        futures = [executor.submit(f, *args) for f, args in func_calls]
+        return [future.result() for future in futures]
+
+
 def cache_with_pickle(hash_func: Callable, post_process_func: Callable | None = None) -> Callable:
     """
     This decorator will cache the return value of the function with pickle.
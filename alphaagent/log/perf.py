@@ -6,12 +6,15 @@ Writes to a dedicated perf.log file when enabled via ENABLE_PERF_LOG environment
 """
 
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Literal
 
 from alphaagent.core.conf import RD_AGENT_SETTINGS
 
+# The flag is read from the environment once when settings are built, so cache it for the hot path
+_ENABLED: bool = bool(RD_AGENT_SETTINGS.enable_perf_log)
+
 # Lazy initialization of the logger
 _perf_logger: logging.Logger | None = None
 
@@ -30,9 +33,9 @@ def _get_perf_logger() -> logging.Logger:
         _perf_logger.setLevel(logging.INFO)
         _perf_logger.propagate = False  # Don't leak into loguru/stderr
 
-        # Create file handler in append mode
+        # Create file handler in append mode; the file is only opened on the first record
         perf_log_path = Path.cwd() / "perf.log"
-        handler = logging.FileHandler(perf_log_path, mode="a", encoding="utf-8")
+        handler = logging.FileHandler(perf_log_path, mode="a", encoding="utf-8", delay=True)
         handler.setLevel(logging.INFO)
 
         # Simple format without logger name or level
@@ -44,6 +47,32 @@ def _get_perf_logger() -> logging.Logger:
     return _perf_logger
 
 
+_date_cache: tuple[tuple[int, int, int], str] = ((0, 0, 0), "")
+
+
+def _iso_timestamp(timestamp: datetime) -> str:
+    """
+    Same output as `timestamp.isoformat()` for naive and UTC timestamps, formatting the
+    date part only once per day. Other timezones fall back to `isoformat()`.
+    """
+    global _date_cache
+    if timestamp.tzinfo is None:
+        offset = ""
+    elif timestamp.tzinfo is timezone.utc:
+        offset = "+00:00"
+    else:
+        return timestamp.isoformat()
+
+    day = (timestamp.year, timestamp.month, timestamp.day)
+    if _date_cache[0] != day:
+        _date_cache = (day, "%04d-%02d-%02d" % day)
+    if timestamp.microsecond:
+        time_part = "%02d:%02d:%02d.%06d" % (timestamp.hour, timestamp.minute, timestamp.second, timestamp.microsecond)
+    else:
+        time_part = "%02d:%02d:%02d" % (timestamp.hour, timestamp.minute, timestamp.second)
+    return f"{_date_cache[1]}T{time_part}{offset}"
+
+
 def log_step(
     timestamp: datetime,
     loop_idx: int,
@@ -63,13 +92,13 @@ def log_step(
         duration_sec: Duration in seconds
         status: Step execution status (success/skipped/error)
     """
-    if not RD_AGENT_SETTINGS.enable_perf_log:
+    if not _ENABLED:
         return
 
     logger = _get_perf_logger()
 
     # Format: ISO8601 timestamp | loop=X step=Y name=Z duration=Xs status=S
-    iso_timestamp = timestamp.isoformat()
+    iso_timestamp = _iso_timestamp(timestamp)
     message = (
         f"{iso_timestamp} | "
         f"loop={loop_idx} step={step_idx} name={step_name} "
@@ -94,13 +123,13 @@ def log_loop_summary(
         total_duration_sec: Total duration of the loop in seconds
         step_count: Number of steps in the loop
     """
-    if not RD_AGENT_SETTINGS.enable_perf_log:
+    if not _ENABLED:
         return
 
     logger = _get_perf_logger()
 
     # Format: ISO8601 timestamp | loop=X SUMMARY steps=Y total_duration=Zs
-    iso_timestamp = timestamp.isoformat()
+    iso_timestamp = _iso_timestamp(timestamp)
     message = (
         f"{iso_timestamp} | "
         f"loop={loop_idx} SUMMARY steps={step_count} "
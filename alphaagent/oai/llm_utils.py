@@ -1,13 +1,13 @@
 from __future__ import annotations
 
 import hashlib
-import inspect
 import json
 import os
 import random
 import re
 import sqlite3
 import ssl
+import sys
 import time
 import urllib.request
 import uuid
@@ -657,10 +657,27 @@ class APIBackend:
         # TODO: we can add this function back to avoid so much `self.cfg.log_llm_chat_content`
         if LLM_SETTINGS.log_llm_chat_content:
             logger.info(self._build_log_messages(messages), tag="llm_messages")
+        # Use index 4 to skip the current function and intermediate calls,
+        # and get the locals of the caller's frame.
+        # sys._getframe is the same frame as inspect.stack()[4] without reading source for every frame.
+        caller_frame = sys._getframe(4)  # noqa: SLF001
+        caller_locals = caller_frame.f_locals
+        if "self" in caller_locals:
+            tag = caller_locals["self"].__class__.__name__
+        else:
+            tag = caller_frame.f_code.co_name
+        del caller_frame, caller_locals
+
+        if reasoning_flag:
+            model = self.reasoning_model
+            json_mode = None
+        else:
+            model = self.chat_model_map.get(tag, self.chat_model)
+
         # TODO: fail to use loguru adaptor due to stream response
         input_content_json = json.dumps(messages)
         input_content_json = (
-            chat_cache_prefix + input_content_json + f"<seed={seed}/>"
+            chat_cache_prefix + input_content_json + f"<seed={seed}/><model={model}/><json_mode={json_mode}/>"
         )  # FIXME this is a hack to make sure the cache represents the round index
         if self.use_chat_cache:
             cache_result = self.cache.chat_get(input_content_json)
@@ -678,20 +695,6 @@ class APIBackend:
         if presence_penalty is None:
             presence_penalty = LLM_SETTINGS.chat_presence_penalty
 
-        # Use index 4 to skip the current function and intermediate calls,
-        # and get the locals of the caller's frame.
-        caller_locals = inspect.stack()[4].frame.f_locals
-        if "self" in caller_locals:
-            tag = caller_locals["self"].__class__.__name__
-        else:
-            tag = inspect.stack()[4].function
-            
-        if reasoning_flag:
-            model = self.reasoning_model
-            json_mode = None
-        else:
-            model = self.chat_model_map.get(tag, self.chat_model)
-
         finish_reason = None
         if self.use_llama2:
             response = self.generator.chat_completion(
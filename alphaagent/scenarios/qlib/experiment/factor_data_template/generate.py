@@ -1,7 +1,31 @@
 import os
+
+import numpy as np
 import qlib
 from qlib.data import D
 
+
+def group_pct_change(data):
+    """
+    Same result as `data.groupby(level=0)["$close"].pct_change().fillna(0)` for a frame
+    sorted by its first index level, computed on the contiguous close array.
+    """
+    close = data["$close"].to_numpy(dtype=np.float64)
+    codes = data.index.codes[0]
+    first = np.ones(len(close), dtype=bool)
+    first[1:] = codes[1:] != codes[:-1]
+
+    # pct_change pads missing closes within each group before dividing
+    positions = np.arange(len(close))
+    filled = close[np.maximum.accumulate(np.where(~np.isnan(close) | first, positions, 0))]
+
+    ret = np.zeros(len(close))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret[1:] = filled[1:] / filled[:-1] - 1.0
+    ret[first | np.isnan(ret)] = 0.0
+    return ret
+
+
 if __name__ == '__main__':
     # Use environment variable for data path (defaults to ~/.qlib/qlib_data/us_data for backwards compatibility)
     provider_uri = os.environ.get("QLIB_DATA_URI", "~/.qlib/qlib_data/us_data")
@@ -9,29 +33,33 @@ if __name__ == '__main__':
 
     instruments = D.instruments()
     fields = ["$open", "$close", "$high", "$low", "$volume"]  # , "$amount", "$turn", "$pettm", "$pbmrq"
-    data = D.features(instruments, fields, freq="day").swaplevel().sort_index().loc["2015-01-01":].sort_index()
+    # Loaded once; the debug subset below is taken from the same frame (it keeps all dates)
+    features = D.features(instruments, fields, freq="day")
+    if features.index.is_monotonic_increasing:
+        # Already ordered by (instrument, datetime): a stable sort on datetime alone gives the same order
+        features = features.swaplevel().sort_index(level=0, sort_remaining=False)
+    else:
+        features = features.swaplevel().sort_index()
+    # Slicing keeps the sorted order; copy so adding $return does not write into `features`
+    data = features.loc["2015-01-01":].copy()
 
     # 计算收益率
-    data["$return"] = data.groupby(level=0)["$close"].pct_change().fillna(0)
+    data["$return"] = group_pct_change(data)
+    # Qlib stores features as float32; keep $return in the same precision instead of widening the file
+    data = data.astype(np.float32, copy=False)
 
     print(data)
 
+    # Stays HDF5: the factor code template and the data README read daily_pv.h5 with pd.read_hdf.
+    # The default "fixed" format writes the column blocks directly (no pytables row appends).
     data.to_hdf("./daily_pv_all.h5", key="data")
 
-    fields = ["$open", "$close", "$high", "$low", "$volume"]  # , "$amount", "$turn", "$pettm", "$pbmrq"
-    data = (
-        (
-            D.features(instruments, fields, freq="day")
-            .swaplevel()
-            .sort_index()
-        )
-        .swaplevel()
-        .loc[data.reset_index()["instrument"].unique()[:100]]
-        .swaplevel()
-        .sort_index()
-    )
+    debug_instruments = data.index.get_level_values("instrument").unique()[:100]
+    data = features[features.index.get_level_values("instrument").isin(debug_instruments)].copy()
+    del features
 
     # 计算收益率
-    data["$return"] = data.groupby(level=0)["$close"].pct_change().fillna(0)
+    data["$return"] = group_pct_change(data)
+    data = data.astype(np.float32, copy=False)
     print(data)
-    data.to_hdf("./daily_pv_debug.h5", key="data")
\ No newline at end of file
+    data.to_hdf("./daily_pv_debug.h5", key="data")
@@ -29,18 +29,14 @@ from qlib.workflow import R
 # Assuming you have already listed the experiments
 experiments = R.list_experiments()
 
-# Iterate through each experiment to find the latest recorder
-experiment_name = None
-latest_recorder = None
-for experiment in experiments:
-    recorders = R.list_recorders(experiment_name=experiment)
-    for recorder_id in recorders:
-        if recorder_id is not None:
-            experiment_name = experiment
-            recorder = R.get_recorder(recorder_id=recorder_id, experiment_name=experiment)
-            end_time = recorder.info["end_time"]
-            if latest_recorder is None or end_time > latest_recorder.info["end_time"]:
-                latest_recorder = recorder
+# Fetch every recorder once and pick the one that finished last
+recorders = [
+    R.get_recorder(recorder_id=recorder_id, experiment_name=experiment)
+    for experiment in experiments
+    for recorder_id in R.list_recorders(experiment_name=experiment)
+    if recorder_id is not None
+]
+latest_recorder = max(recorders, key=lambda recorder: recorder.info["end_time"], default=None)
 
 # Check if the latest recorder is found
 if latest_recorder is None:
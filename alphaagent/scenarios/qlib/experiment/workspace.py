@@ -23,14 +23,16 @@ class QlibFBWorkspace(FBWorkspace):
     ) -> str:
         # Replace hardcoded data paths in YAML files with actual data directory
         if use_local:
-            from alphaagent.app.utils.data import get_data_dir
-            data_uri = str(get_data_dir())
+            from alphaagent.app.utils.data import get_data_dir  # cached after the first call
+
+            # Work on raw bytes (no decode/encode round-trip) and leave unchanged files untouched
+            data_uri = str(get_data_dir()).encode()
             for yaml_file in self.workspace_path.glob("*.yaml"):
-                content = yaml_file.read_text()
-                updated = content.replace("~/.qlib/qlib_data/us_data", data_uri)
-                if updated != content:
-                    yaml_file.write_text(updated)
-                    logger.debug(f"Updated data path in {yaml_file.name}")
+                content = yaml_file.read_bytes()
+                if b"~/.qlib/qlib_data/us_data" not in content:
+                    continue
+                yaml_file.write_bytes(content.replace(b"~/.qlib/qlib_data/us_data", data_uri))
+                logger.debug(f"Updated data path in {yaml_file.name}")
 
         # 使用本地环境或Docker环境
         qtde = QTDockerEnv(is_local=use_local)
@@ -7,10 +7,14 @@ it is not binding to the scenarios or framework (So it is not placed in rdagent.
 # TODO: split the utils in this module into different modules in the future.
 
 import importlib
+import os
 import re
+import shutil
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from types import ModuleType
-from typing import Union
+from typing import List, Optional, Union
 
 
 def get_module_by_module_path(module_path: Union[str, ModuleType]):
@@ -53,3 +57,53 @@ def convert2bool(value: Union[str, bool]) -> bool:
         return value
     else:
         raise ValueError(f"Unknown value type {value} to bool")
+
+
+def _raise(error: OSError) -> None:
+    raise error
+
+
+def _unlink_all(paths: List[str]) -> None:
+    for path in paths:
+        os.unlink(path)
+
+
+def parallel_rmtree(root: Union[str, Path], max_workers: Optional[int] = None) -> None:
+    """
+    Remove a directory tree like `shutil.rmtree`, but unlink files from a thread pool.
+
+    Deleting many small files is dominated by filesystem metadata operations, which
+    overlap well across threads. Directories are removed bottom-up once all files are gone.
+    Falls back to `shutil.rmtree` on non-POSIX platforms.
+
+    Like `shutil.rmtree`, symlinks are never followed: a symlinked root is removed as a link
+    rather than emptying its target, and directories that cannot be listed raise.
+    """
+    if os.name != "posix":
+        shutil.rmtree(root)
+        return
+
+    if os.path.islink(root):
+        os.unlink(root)
+        return
+
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+
+    dirs = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        for dirpath, dirnames, filenames in os.walk(root, topdown=False, onerror=_raise, followlinks=False):
+            # Symlinks to directories are listed in dirnames but must be unlinked, not walked
+            paths = [os.path.join(dirpath, name) for name in filenames]
+            paths.extend(p for p in (os.path.join(dirpath, name) for name in dirnames) if os.path.islink(p))
+            if paths:
+                futures.append(executor.submit(_unlink_all, paths))
+            dirs.append(dirpath)
+        for future in futures:
+            future.result()
+
+    # os.walk(topdown=False) yields children before parents
+    for dirpath in dirs:
+        os.rmdir(dirpath)
+
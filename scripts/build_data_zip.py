@@ -10,6 +10,7 @@ Usage:
 """
 
 import argparse
+import os
 import zipfile
 from pathlib import Path
 from loguru import logger
@@ -17,15 +18,11 @@ from loguru import logger
 
 def get_sp500_symbols(instruments_file: Path) -> set:
     """Extract SP500 symbols from instruments file (normalized to lowercase)."""
-    symbols = set()
-    if instruments_file.exists():
-        with open(instruments_file, 'r') as f:
-            for line in f:
-                parts = line.strip().split('\t')
-                if parts:
-                    # Normalize to lowercase to match feature directory names
-                    symbols.add(parts[0].lower())
-    return symbols
+    if not instruments_file.exists():
+        return set()
+    # Read the file in one call; normalize to lowercase to match feature directory names
+    lines = instruments_file.read_text().splitlines()
+    return {line.split('\t', 1)[0].strip().lower() for line in lines if line.strip()}
 
 
 def should_include_file(file_path: Path, sp500_symbols: set, features_dir: Path) -> bool:
@@ -68,6 +65,23 @@ def should_include_file(file_path: Path, sp500_symbols: set, features_dir: Path)
     return True
 
 
+def iter_files(root: Path, skip_dir=None):
+    """
+    Yield a DirEntry for every file under root, reusing the type information from readdir.
+
+    Directories for which skip_dir(entry) returns True are not descended into.
+    """
+    stack = [str(root)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if skip_dir is None or not skip_dir(entry):
+                        stack.append(entry.path)
+                elif entry.is_file():
+                    yield entry
+
+
 def build_zip(source_dir: Path, output_zip: Path) -> None:
     """
     Package Qlib data directory into a ZIP file.
@@ -109,21 +123,27 @@ def build_zip(source_dir: Path, output_zip: Path) -> None:
     file_count = 0
     total_size = 0
 
-    with zipfile.ZipFile(output_zip, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as zipf:
-        for file_path in source_dir.rglob('*'):
-            if file_path.is_file():
-                # Check if file should be included
-                if not should_include_file(file_path, sp500_symbols, features_dir):
-                    continue
+    # Prune symbol directories outside the universe instead of filtering each of their files
+    def skip_symbol_dir(entry: os.DirEntry) -> bool:
+        if os.path.dirname(entry.path) == str(features_dir) and entry.name not in sp500_symbols:
+            logger.debug(f"Excluding {entry.name} (not in SP500)")
+            return True
+        return False
+
+    file_paths = [
+        Path(entry.path) for entry in iter_files(source_dir, skip_dir=skip_symbol_dir)
+        if should_include_file(Path(entry.path), sp500_symbols, features_dir)
+    ]
 
-                # Add to ZIP
-                arcname = file_path.relative_to(source_dir)
-                zipf.write(file_path, arcname)
-                file_count += 1
-                total_size += file_path.stat().st_size
+    with zipfile.ZipFile(output_zip, 'w', zipfile.ZIP_DEFLATED, compresslevel=6) as zipf:
+        for file_path in file_paths:
+            arcname = file_path.relative_to(source_dir)
+            zipf.write(file_path, arcname)
+            file_count += 1
+            total_size += file_path.stat().st_size
 
-                if file_count % 1000 == 0:
-                    logger.info(f"Packed {file_count} files...")
+            if file_count % 1000 == 0:
+                logger.info(f"Packed {file_count} files...")
 
     zip_size = output_zip.stat().st_size
     logger.info("=" * 60)
@@ -154,9 +174,7 @@ def main():
     try:
         build_zip(args.source_dir.expanduser().resolve(), output_zip)
     except Exception as e:
-        logger.error(f"Failed to build ZIP: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Failed to build ZIP: {e}")
         exit(1)
 
 